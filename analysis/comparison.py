@@ -1,9 +1,15 @@
 # %%
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")
 
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
+from matplotlib.ticker import FuncFormatter
 
 sns.set_theme(style="whitegrid")
 
@@ -25,39 +31,58 @@ if not os.path.exists(save_dir):
 
 # %%
 # Import the data
+CSV_DTYPES = {
+    "write_time": "float64",
+    "read_time": "float64",
+    "blob_size": "int64",
+    "batch_size": "int64",
+}
+SYSTEM_DTYPE = pd.CategoricalDtype([label_system_one, label_system_two])
+
+
+def read_results(filename, label):
+    df = pd.read_csv(
+        os.path.join(read_dir, filename), engine="pyarrow", dtype=CSV_DTYPES
+    )
+    df["system"] = pd.Categorical([label] * len(df), dtype=SYSTEM_DTYPE)
+    return df
 
-df1 = pd.read_csv(os.path.join(read_dir, f"{filename_system_one}_read_write.csv"))
-df1["system"] = label_system_one
-
-df2 = pd.read_csv(os.path.join(read_dir, f"{filename_system_two}_read_write.csv"))
-df2["system"] = label_system_two
-
-df3 = pd.read_csv(os.path.join(read_dir, f"{filename_system_one}_batch_read.csv"))
-df3["system"] = label_system_one
 
-df4 = pd.read_csv(os.path.join(read_dir, f"{filename_system_two}_batch_read.csv"))
-df4["system"] = label_system_two
+files = [
+    (f"{filename_system_one}_read_write.csv", label_system_one),
+    (f"{filename_system_two}_read_write.csv", label_system_two),
+    (f"{filename_system_one}_batch_read.csv", label_system_one),
+    (f"{filename_system_two}_batch_read.csv", label_system_two),
+]
 
-df = pd.concat([df1, df2, df3, df4])
+# The CSV parser releases the GIL, so the files are read in parallel threads
+with ThreadPoolExecutor(max_workers=len(files)) as executor:
+    dfs = list(executor.map(lambda file: read_results(*file), files))
 
-# %%
-# Clean the data
-df["blob_size"] = df["blob_size"].astype("int")
-df["system"] = df["system"].astype("category")
-df["write_time"] = df["write_time"].astype("float")
-df["read_time"] = df["read_time"].astype("float")
-
-df["total_time"] = df["write_time"] + df["read_time"]
+df = pd.concat(dfs, ignore_index=True)
+df["blob_size"] = pd.Categorical(
+    df["blob_size"], categories=sorted(df["blob_size"].unique()), ordered=True
+)
 
-df["total_time_ms"] = df["total_time"] * 1000
-df["write_time_ms"] = df["write_time"] * 1000
-df["read_time_ms"] = df["read_time"] * 1000
+# Compute the quartiles of every (batch size, system, blob size) group once
+# and slice them per plot instead of re-aggregating the raw rows each time
+stats = (
+    df.groupby(["batch_size", "system", "blob_size"], observed=True)[
+        ["write_time", "read_time"]
+    ]
+    .quantile([0.25, 0.5, 0.75])
+    .unstack()
+)
+stats_single = stats.loc[1]
+stats_batch = stats.loc[1_000]
+batch_blob_sizes = stats_batch.index.get_level_values("blob_size").astype("int64")
+stats_batch_small = stats_batch[batch_blob_sizes < 65536]
+stats_batch_large = stats_batch[batch_blob_sizes >= 65536]
 
 
 # %%
 # Format the size in bytes to human readable format
 def format_size_binary(size):
-    size = int(size)
     if size >= 2**30:
         return f"{size // 2**30} GiB"
     elif size >= 2**20:
@@ -70,73 +95,92 @@ def format_size_binary(size):
 
 # %%
 # Plot barplot and save the figure
-def plot_barplot(df, x, y, hue, title, x_label, y_label, save_path):
+# `stats` holds the quartiles of `y` per (`hue`, `x`) group; the bars show the
+# median and the error bars the interquartile range. Times are stored in
+# seconds; `scale` converts them for display only
+def plot_barplot(
+    stats, x, y, hue, title, x_label, y_label, save_path, scale=1.0, show=False
+):
     fig, ax = plt.subplots(figsize=(8, 5))
-    sns.barplot(
-        ax=ax,
-        data=df,
-        x=x,
-        y=y,
-        hue=hue,
-        estimator="median",
-        errorbar=("pi", 50),
-        palette=["#a5d8ff", "#ffd8a8"],
-        width=0.8,
-    )
-    xlabels = [format_size_binary(item.get_text()) for item in ax.get_xticklabels()]
-    ax.set_xticklabels(xlabels, rotation=90)
-    ax.set_title(title)
-    ax.set_ylabel(y_label)
-    ax.set_xlabel(x_label)
-    ax.legend(loc="best")
-    for i in ax.containers:
-        ax.bar_label(
-            i,
-            label_type="center",
-            padding=0,
-            rotation=0,
-            fontsize=8,
-            fmt="%.1f",
-            color="black",
-            weight="bold",
+    try:
+        quartiles = stats[y]
+        x_values = quartiles.index.get_level_values(x).unique().sort_values()
+        hue_values = quartiles.index.get_level_values(hue).unique()
+        width = 0.8 / len(hue_values)
+        for i, (label, color) in enumerate(zip(hue_values, ["#a5d8ff", "#ffd8a8"])):
+            group = quartiles.xs(label, level=hue)
+            median = group[0.5]
+            positions = x_values.get_indexer(group.index) - 0.4 + width * (i + 0.5)
+            bars = ax.bar(
+                positions,
+                median,
+                width,
+                yerr=[median - group[0.25], group[0.75] - median],
+                color=color,
+                ecolor=".26",
+                label=label,
+            )
+            ax.bar_label(
+                bars,
+                label_type="center",
+                padding=0,
+                rotation=0,
+                fontsize=8,
+                fmt=lambda v: f"{v * scale:.1f}",
+                color="black",
+                weight="bold",
+            )
+        ax.set_xticks(
+            range(len(x_values)),
+            [format_size_binary(size) for size in x_values],
+            rotation=90,
         )
-    plt.show()
-    if save_path is not None:
-        fig.savefig(save_path, bbox_inches="tight", dpi=300)
-    fig.clear()
+        ax.set_title(title)
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda v, _: f"{v * scale:g}"))
+        ax.set_ylabel(y_label)
+        ax.set_xlabel(x_label)
+        ax.legend(loc="best")
+        if show:
+            plt.show()
+        if save_path is not None:
+            fig.savefig(save_path, bbox_inches="tight", dpi=300)
+    finally:
+        plt.close(fig)
 
 
 # %%
 # Result for individual write operations
 plot_barplot(
-    df=df[df["batch_size"] == 1],
+    stats=stats_single,
     x="blob_size",
-    y="write_time_ms",
+    y="write_time",
     hue="system",
     title="Write Time vs Blob Size for Single Writes",
     x_label="Blob Size (bytes)",
     y_label="Write Time (ms)",
     save_path=os.path.join(save_dir, "single_write_time.png"),
+    scale=1000,
 )
 
 # %%
 # Result for individual read operations
 plot_barplot(
-    df=df[df["batch_size"] == 1],
+    stats=stats_single,
     x="blob_size",
-    y="read_time_ms",
+    y="read_time",
     hue="system",
     title="Read Time vs Blob Size for Single Reads",
     x_label="Blob Size (bytes)",
     y_label="Read Time (ms)",
     save_path=os.path.join(save_dir, "single_read_time.png"),
+    scale=1000,
 )
 
 
 # %%
 # Result for batch read operations
 plot_barplot(
-    df=df[df["batch_size"] == 1_000],
+    stats=stats_batch,
     x="blob_size",
     y="read_time",
     hue="system",
@@ -149,7 +193,7 @@ plot_barplot(
 # %%
 # Result for for batch read operations below 64 KiB
 plot_barplot(
-    df=df[(df["batch_size"] == 1_000) & (df["blob_size"] < 64 * 2**10)],
+    stats=stats_batch_small,
     x="blob_size",
     y="read_time",
     hue="system",
@@ -162,7 +206,7 @@ plot_barplot(
 # %%
 # Result for for batch read operations above 64 KiB
 plot_barplot(
-    df=df[(df["batch_size"] == 1_000) & (df["blob_size"] >= 64 * 2**10)],
+    stats=stats_batch_large,
     x="blob_size",
     y="read_time",
     hue="system",
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import threading
 import time
 
+import numpy as np
 from systems.base_system import BaseSystem
 from systems.influxdb_minio import InfluxDBMinioSystem
 from systems.mongodb import MongoDBSystem
@@ -10,15 +12,21 @@ from systems.reductstore import ReductStoreSystem
 from systems.timescaledb import TimescaleDBSystem
 from tqdm import tqdm
 from utils import (
+    ResultsWriter,
     ask_for_confirmation,
     format_size_binary,
-    generate_blob,
     print_benchmark_params,
-    save_results,
+    produce_blobs,
 )
 
+# Number of distinct blobs rotated through a batch, so that consecutive
+# writes differ without generating a new blob on every iteration.
+# The pool holds bytes rather than memoryviews into one shared buffer: some
+# clients (e.g. GridFS uploads) only accept bytes and would copy a view anyway.
+BLOB_POOL_SIZE = 16
 
-async def write_data(system: BaseSystem, blob: bytes, timestamp: int) -> float:
+
+async def write_data(system: BaseSystem, blob: bytes, timestamp: int) -> int:
     """Write data to the system.
 
 
@@ -31,16 +39,15 @@ async def write_data(system: BaseSystem, blob: bytes, timestamp: int) -> float:
 
     Returns:
     --------
-    float
-        The time taken to write the data in seconds.
+    int
+        The time taken to write the data in nanoseconds.
     """
-    start_time = time.time()
+    t0 = time.perf_counter_ns()
     await system.write_data(blob, timestamp)
-    end_time = time.time()
-    return end_time - start_time
+    return time.perf_counter_ns() - t0
 
 
-async def read_last(system: BaseSystem) -> tuple[bytes, float]:
+async def read_last(system: BaseSystem) -> tuple[bytes, int]:
     """Read the last data from the system.
 
     Parameters:
@@ -50,16 +57,15 @@ async def read_last(system: BaseSystem) -> tuple[bytes, float]:
 
     Returns:
     --------
-    (bytes, float)
-        The data read and the time taken to read it in seconds.
+    (bytes, int)
+        The data read and the time taken to read it in nanoseconds.
     """
-    start_time = time.time()
+    t0 = time.perf_counter_ns()
     result = await system.read_last()
-    end_time = time.time()
-    return result, end_time - start_time
+    return result, time.perf_counter_ns() - t0
 
 
-async def read_batch(system: BaseSystem, start: int) -> tuple[list[bytes], float]:
+async def read_batch(system: BaseSystem, start: int) -> tuple[list[bytes], int]:
     """Read a batch of data from the system.
 
     Parameters:
@@ -71,13 +77,130 @@ async def read_batch(system: BaseSystem, start: int) -> tuple[list[bytes], float
 
     Returns:
     --------
-    (list[bytes], float)
-        The data read and the time taken to read it in seconds.
+    (list[bytes], int)
+        The data read and the time taken to read it in nanoseconds.
     """
-    start_time = time.time()
+    t0 = time.perf_counter_ns()
     result = await system.read_batch(start)
-    end_time = time.time()
-    return result, end_time - start_time
+    return result, time.perf_counter_ns() - t0
+
+
+async def write_then_read(
+    system: BaseSystem, blob: bytes, timestamp: int
+) -> tuple[bytes, int, int]:
+    """Write data to the system, then read the last data back.
+
+    Parameters:
+    -----------
+    system: BaseSystem
+        The system to write to and read from.
+    blob: bytes
+        The data to write.
+    timestamp: int
+        The timestamp of the data in nanoseconds.
+
+    Returns:
+    --------
+    (bytes, int, int)
+        The data read, the time taken to write and the time taken to read
+        in nanoseconds.
+    """
+    t0 = time.perf_counter_ns()
+    await system.write_data(blob, timestamp)
+    t1 = time.perf_counter_ns()
+    result = await system.read_last()
+    t2 = time.perf_counter_ns()
+    return result, t1 - t0, t2 - t1
+
+
+async def _timed_write(
+    system: BaseSystem,
+    semaphore: asyncio.Semaphore,
+    index: int,
+    blob: bytes,
+    timestamp: int,
+) -> tuple[int, int]:
+    """Write a blob once a pipeline slot is free and return (index, nanoseconds)."""
+    async with semaphore:
+        t0 = time.perf_counter_ns()
+        await system.write_data(blob, timestamp)
+        return index, time.perf_counter_ns() - t0
+
+
+async def _timed_read_last(
+    system: BaseSystem,
+    semaphore: asyncio.Semaphore,
+    index: int,
+) -> tuple[int, bytes, int]:
+    """Read the last blob once a pipeline slot is free.
+
+    Returns (index, data, nanoseconds).
+    """
+    async with semaphore:
+        t0 = time.perf_counter_ns()
+        result = await system.read_last()
+        return index, result, time.perf_counter_ns() - t0
+
+
+async def benchmark_pipeline(
+    system: BaseSystem,
+    blobs: list[bytes],
+    batch_size: int,
+    depth: int = 64,
+) -> tuple[list[int], list[int], list[int]]:
+    """Benchmark write and read operations with several requests in flight.
+
+    All writes are submitted at once and bounded by a semaphore of `depth`
+    slots, then the same is done for the reads. Each operation is timed
+    individually, from acquiring its slot until it completes.
+
+    Parameters:
+    -----------
+    system: BaseSystem
+        The system to benchmark.
+    blobs: list[bytes]
+        Blobs of the same size, rotated through the writes.
+    batch_size: int
+        Number of blobs to write and read.
+    depth: int
+        Maximum number of outstanding requests.
+
+    Returns:
+    --------
+    (list[int], list[int], list[int])
+        The write times and read times in nanoseconds, and the timestamps
+        of the written blobs.
+    """
+    semaphore = asyncio.Semaphore(depth)
+
+    # Space the timestamps by 1 ms, the resolution MongoDB stores them at,
+    # so that no two records tie on time
+    start = time.time_ns()
+    timestamps = [start + i * 1_000_000 for i in range(batch_size)]
+
+    write_times = [0] * batch_size
+    tasks = [
+        asyncio.create_task(
+            _timed_write(system, semaphore, i, blobs[i % len(blobs)], timestamp)
+        )
+        for i, timestamp in enumerate(timestamps)
+    ]
+    for i, elapsed in await asyncio.gather(*tasks):
+        write_times[i] = elapsed
+
+    # All writes are done before the reads start, so every read returns the
+    # blob written with the latest timestamp
+    last_blob = blobs[(batch_size - 1) % len(blobs)] if batch_size else None
+    read_times = [0] * batch_size
+    tasks = [
+        asyncio.create_task(_timed_read_last(system, semaphore, i))
+        for i in range(batch_size)
+    ]
+    for i, result, elapsed in await asyncio.gather(*tasks):
+        assert result == last_blob
+        read_times[i] = elapsed
+
+    return write_times, read_times, timestamps
 
 
 async def benchmark_system(
@@ -86,8 +209,11 @@ async def benchmark_system(
     batch_size: int,
     batch_reads: int,
     warmups: int,
-    directory: str = "results",
+    writer: ResultsWriter,
     quiet: bool = False,
+    pipeline_depth: int = 0,
+    position: int = 2,
+    concurrent_warmup: bool = True,
 ):
     """
     Benchmark data writing and reading operations on a given system.
@@ -117,12 +243,23 @@ async def benchmark_system(
         These runs serve as a "warm-up" phase and are not included in the
         final performance metrics.
 
-    - directory : str, optional, default "results"
-        The directory where the benchmark results will be saved.
+    - writer : ResultsWriter
+        The writer that saves the benchmark results.
 
     - quiet : bool, optional, default False
         If set to True, the benchmark will not print any progress information.
 
+    - pipeline_depth : int, optional, default 0
+        Number of write/read requests kept in flight at once.
+        If 0, the blobs are written and read one at a time.
+
+    - position : int, optional, default 2
+        Line offset of the first of the two progress bars of this system.
+
+    - concurrent_warmup : bool, optional, default True
+        If set to True, the warmup blobs are written concurrently and only
+        the last one is read back.
+
     Side Effects:
     -------------
     - Saves the benchmark results in two CSV files:
@@ -130,6 +267,9 @@ async def benchmark_system(
         2. A file named "{system_name}_batch_read.csv" capturing batch read times.
 
     Where {system_name} is the name of the benchmarked storage platform.
+    With a pipeline depth, the individual times are saved to
+    "{system_name}_pipeline_d{pipeline_depth}.csv" instead, as they include
+    queueing and cannot be compared with the one-at-a-time times.
 
     """
     if not quiet:
@@ -137,10 +277,21 @@ async def benchmark_system(
         tqdm.write(f"Benchmarking {type(system).__name__}...")
         tqdm.write(f"Blob size: {format_size_binary(blob_size)}")
 
-    write_times = []
-    read_times = []
-    timestamps = []
-    batch_read_times = []
+    # Result rows as (write_time, read_time, blob_size, batch_size),
+    # with the times in nanoseconds until they are saved
+    read_write_results = np.empty((batch_size, 4))
+    read_write_results[:, 2:] = blob_size, 1
+    batch_read_results = np.empty((batch_reads, 4))
+    batch_read_results[:, :] = np.nan, 0, blob_size, batch_size
+    timestamps: list[int] = []
+
+    # Generate the blobs in the background, so that the blobs rotated through
+    # the batch are ready by the time the warmup is done
+    pool_size = min(batch_size, BLOB_POOL_SIZE)
+    stop_producer = threading.Event()
+    blob_producer = produce_blobs(
+        blob_size, warmups + pool_size, stop_producer, BLOB_POOL_SIZE
+    )
 
     try:
         # Warmup
@@ -148,82 +299,110 @@ async def benchmark_system(
             tqdm.write(
                 f"Warming up with {warmups} {'run' if warmups == 1 else 'runs'}..."
             )
-        for _ in range(warmups):
-            blob = generate_blob(blob_size)
+        if concurrent_warmup and warmups > 0:
+            # Warmup writes are not measured, so they are all sent at once.
+            # They go through write_data, so that the requests of the measured
+            # loop (e.g. prepared statements) are warmed up. The timestamps are
+            # spaced by 1 ms, the resolution MongoDB stores them at, so that
+            # the last blob is the only one with the latest timestamp
+            blobs = [next(blob_producer) for _ in range(warmups)]
             timestamp = time.time_ns()
-            _ = await write_data(system, blob, timestamp)
+            await asyncio.gather(
+                *[
+                    system.write_data(blob, timestamp + i * 1_000_000)
+                    for i, blob in enumerate(blobs)
+                ]
+            )
             result, _ = await read_last(system)
-            assert result == blob
-
-        # Write and read one blob at a time
-        with tqdm(
-            total=batch_size,
-            desc="Write and read operations",
-            leave=False,
-            position=2,
-            disable=quiet,
-        ) as third_bar:
-            for _ in range(batch_size):
-                blob = generate_blob(blob_size)
-
-                # Benchmark write and read operations
+            # The last warmup blob has the latest timestamp
+            assert result == blobs[-1]
+        else:
+            for _ in range(warmups):
+                blob = next(blob_producer)
                 timestamp = time.time_ns()
-                time_to_write = await write_data(system, blob, timestamp)
-                result, time_to_read = await read_last(system)
-                assert blob == result
+                _ = await write_data(system, blob, timestamp)
+                result, _ = await read_last(system)
+                assert result == blob
+
+        blobs = list(blob_producer)
+        if pipeline_depth > 0:
+            # Write and read the blobs with several requests in flight
+            write_times, read_times, timestamps = await benchmark_pipeline(
+                system, blobs, batch_size, pipeline_depth
+            )
+            read_write_results[:, 0] = write_times
+            read_write_results[:, 1] = read_times
+        else:
+            # Write and read one blob at a time
+            with tqdm(
+                total=batch_size,
+                desc="Write and read operations",
+                leave=False,
+                position=position,
+                disable=quiet,
+                mininterval=0.5,
+            ) as third_bar:
+                for i in range(batch_size):
+                    blob = blobs[i % len(blobs)]
+
+                    # Benchmark write and read operations
+                    timestamp = time.time_ns()
+                    result, time_to_write, time_to_read = await write_then_read(
+                        system, blob, timestamp
+                    )
+
+                    # The warmup already validated the round trip; comparing
+                    # every blob would add a full-length memcmp per iteration
+                    if i == 0 or i == batch_size - 1:
+                        assert blob == result
 
-                # Save the results
-                write_times.append(time_to_write)
-                read_times.append(time_to_read)
-                timestamps.append(timestamp)
+                    # Save the results
+                    read_write_results[i, 0] = time_to_write
+                    read_write_results[i, 1] = time_to_read
+                    timestamps.append(timestamp)
 
-                third_bar.update()
+                    third_bar.update()
 
         # Read all blobs in a batch
         with tqdm(
             total=batch_reads,
             desc="Batch reads",
             leave=False,
-            position=3,
+            position=position + 1,
             disable=quiet,
+            mininterval=0.5,
         ) as fourth_bar:
-            for _ in range(batch_reads):
+            for i in range(batch_reads):
                 result, time_read = await read_batch(system, timestamps[0])
                 assert len(result) == batch_size
-                batch_read_times.append(time_read)
+                batch_read_results[i, 1] = time_read
 
                 fourth_bar.update()
 
         # Calculate average times
         if not quiet:
-            avg_write_time = sum(write_times) / batch_size
-            avg_read_time = sum(read_times) / batch_size
-            avg_batch_read_time = sum(batch_read_times) / batch_reads
-
-            tqdm.write(f"Average write time: {avg_write_time*1000:.2f} ms")
-            tqdm.write(f"Average read time: {avg_read_time*1000:.2f} ms")
-            tqdm.write(f"Average batch read time: {avg_batch_read_time*1000:.2f} ms")
-
-        # Save the results
-        save_results(
-            filename=f"{type(system).__name__}_read_write.csv",
-            directory=directory,
-            blob_size=blob_size,
-            batch_size=1,
-            write_times=write_times,
-            read_times=read_times,
-            quiet=quiet,
-        )
-        save_results(
-            filename=f"{type(system).__name__}_batch_read.csv",
-            directory=directory,
-            blob_size=blob_size,
-            batch_size=batch_size,
-            read_times=batch_read_times,
-            quiet=quiet,
-        )
+            avg_write_time = read_write_results[:, 0].mean()
+            avg_read_time = read_write_results[:, 1].mean()
+            avg_batch_read_time = batch_read_results[:, 1].mean()
+
+            tqdm.write(f"Average write time: {avg_write_time / 1e6:.2f} ms")
+            tqdm.write(f"Average read time: {avg_read_time / 1e6:.2f} ms")
+            tqdm.write(f"Average batch read time: {avg_batch_read_time / 1e6:.2f} ms")
+
+        # Save the results in seconds
+        read_write_results[:, :2] /= 1e9
+        batch_read_results[:, :2] /= 1e9
+        if pipeline_depth > 0:
+            read_write_file = f"{type(system).__name__}_pipeline_d{pipeline_depth}.csv"
+        else:
+            read_write_file = f"{type(system).__name__}_read_write.csv"
+        writer.append(read_write_file, read_write_results)
+        writer.append(f"{type(system).__name__}_batch_read.csv", batch_read_results)
 
     finally:
+        # Let the producer exit if the blobs were not all taken
+        stop_producer.set()
+
         # Clean up the system even if an exception occurs
         if not quiet:
             tqdm.write("Cleaning up...")
@@ -232,12 +411,23 @@ async def benchmark_system(
             tqdm.write("System cleaned up!")
 
 
+async def create_and_benchmark_system(system_class: type[BaseSystem], *args, **kwargs):
+    """Create a system of the given class and benchmark it with `benchmark_system`.
+
+    Used to run a system on its own event loop, on which it has to be created.
+    """
+    system = await system_class.create()
+    await benchmark_system(system, *args, **kwargs)
+
+
 def parse_arguments():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(
         description="""
     Run the benchmarking script.
 
+    Run with `python -O` to skip the validation of the data read back.
+
     Units of Measurement:
     ---------------------
         - Kibibyte (KiB): 2^10 bytes
@@ -265,9 +455,9 @@ def parse_arguments():
     parser.add_argument("--warmups", type=int, default=1, help="Number of warmup runs.")
     parser.add_argument(
         "--quiet",
-        action="store_false",
+        action="store_true",
         default=False,
-        help="Print detailed output during runs.",
+        help="Do not print progress information during runs.",
     )
     parser.add_argument(
         "--directory",
@@ -275,6 +465,34 @@ def parse_arguments():
         default="results",
         help="Directory where the results will be saved.",
     )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=0,
+        help="Number of write/read requests in flight at once (0 = one at a time).\n"
+        "Pipelined times are saved to {System}_pipeline_d{depth}.csv.",
+    )
+    parser.add_argument(
+        "--concurrent-systems",
+        action="store_true",
+        default=False,
+        help="Benchmark all systems at the same time, each on its own event loop\n"
+        "in a separate thread. The systems still share the CPU, the GIL, the disk\n"
+        "and the network of this host, so they skew each other's results.\n"
+        "Only use this when the systems run on separate machines.",
+    )
+    parser.add_argument(
+        "--concurrent-warmup",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Send the warmup writes concurrently.",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        default=False,
+        help="Start the benchmark without asking for confirmation.",
+    )
     return parser.parse_args()
 
 
@@ -286,6 +504,10 @@ async def main(
     warmups: int,
     directory: str,
     quiet: bool,
+    pipeline_depth: int = 0,
+    concurrent_systems: bool = False,
+    concurrent_warmup: bool = True,
+    yes: bool = False,
 ):
     """
     Benchmark main execution function.
@@ -316,6 +538,21 @@ async def main(
     - quiet : bool, optional
         If set to True, the benchmark will not print detailed output during runs.
 
+    - pipeline-depth : int, default=0
+        Number of write/read requests in flight at once.
+        If 0, the blobs are written and read one at a time.
+
+    - concurrent-systems : bool, default=False
+        If set to True, the systems are benchmarked at the same time,
+        each on its own event loop in a separate thread, instead of one
+        after another. They still compete for the resources of this host.
+
+    - concurrent-warmup : bool, default=True
+        If set to True, the warmup writes are sent concurrently.
+
+    - yes : bool, default=False
+        If set to True, the benchmark starts without asking for confirmation.
+
     Units of Measurement:
     ---------------------
         - Kibibyte (KiB): 2^10 bytes
@@ -333,10 +570,11 @@ async def main(
         batch_reads,
         warmups,
     )
-    ask_for_confirmation()
+    ask_for_confirmation(auto=yes)
 
-    # Run the benchmark
-    with tqdm(
+    # Run the benchmark, keeping the result files open until it is done
+    writer = ResultsWriter(directory, quiet)
+    with writer, tqdm(
         total=len(blob_sizes),
         desc="Blob sizes",
         leave=False,
@@ -344,34 +582,78 @@ async def main(
         disable=quiet,
     ) as first_pbar:
         for blob_size in blob_sizes:
-            system_one = await InfluxDBMinioSystem.create()
-            system_two = await ReductStoreSystem.create()
-            system_three = await TimescaleDBSystem.create()
-            system_four = await MongoDBSystem.create()
-            systems = [system_one, system_two, system_three, system_four]
+            system_classes = [
+                InfluxDBMinioSystem,
+                ReductStoreSystem,
+                TimescaleDBSystem,
+                MongoDBSystem,
+            ]
             with tqdm(
-                total=len(systems),
+                total=len(system_classes),
                 desc="Systems",
                 leave=False,
                 position=1,
                 disable=quiet,
             ) as second_pbar:
-                for system in systems:
-                    await benchmark_system(
-                        system,
-                        blob_size,
-                        batch_size,
-                        batch_reads,
-                        warmups,
-                        directory,
-                        quiet,
+                if concurrent_systems:
+                    # The MongoDB and InfluxDB clients are synchronous and block
+                    # the event loop they are called from, so each system gets
+                    # its own loop in a separate thread. Every thread is waited
+                    # for before an error is raised, so that none of them still
+                    # appends results once the writer is closed
+                    results = await asyncio.gather(
+                        *[
+                            asyncio.to_thread(
+                                asyncio.run,
+                                create_and_benchmark_system(
+                                    system_class,
+                                    blob_size,
+                                    batch_size,
+                                    batch_reads,
+                                    warmups,
+                                    writer,
+                                    quiet,
+                                    pipeline_depth,
+                                    position=2 + 2 * i,
+                                    concurrent_warmup=concurrent_warmup,
+                                ),
+                            )
+                            for i, system_class in enumerate(system_classes)
+                        ],
+                        return_exceptions=True,
                     )
-                    second_pbar.update()
+                    for result in results:
+                        if isinstance(result, BaseException):
+                            raise result
+                    second_pbar.update(len(system_classes))
+                else:
+                    systems = [
+                        await system_class.create() for system_class in system_classes
+                    ]
+                    for system in systems:
+                        await benchmark_system(
+                            system,
+                            blob_size,
+                            batch_size,
+                            batch_reads,
+                            warmups,
+                            writer,
+                            quiet,
+                            pipeline_depth,
+                            concurrent_warmup=concurrent_warmup,
+                        )
+                        second_pbar.update()
             first_pbar.update()
 
 
 if __name__ == "__main__":
     args = parse_arguments()
+    try:
+        import uvloop
+
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(
         main(
             args.start_power,
@@ -381,5 +663,9 @@ if __name__ == "__main__":
             args.warmups,
             args.directory,
             args.quiet,
+            args.pipeline_depth,
+            args.concurrent_systems,
+            args.concurrent_warmup,
+            args.yes,
         )
     )
@@ -1,4 +1,5 @@
 import os
+from dataclasses import dataclass
 
 from dotenv import load_dotenv
 
@@ -10,36 +11,75 @@ def str_to_bool(value: str) -> bool:
     return value.lower() in ["true", "1", "yes"]
 
 
-# Minio
-MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
-MINIO_IS_SECURE = str_to_bool(os.getenv("MINIO_IS_SECURE"))
-MINIO_BUCKET = os.getenv("MINIO_BUCKET")
-
-# InfluxDB
-INFLUXDB_ENDPOINT = os.getenv("INFLUXDB_ENDPOINT")
-INFLUXDB_TOKEN = os.getenv("INFLUXDB_TOKEN")
-INFLUXDB_ORG = os.getenv("INFLUXDB_ORG")
-INFLUXDB_BUCKET = os.getenv("INFLUXDB_BUCKET")
-INFLUXDB_MEASUREMENT = os.getenv("INFLUXDB_MEASUREMENT")
-INFLUXDB_FIELD = os.getenv("INFLUXDB_FIELD")
-
-# ReductStore
-REDUCTSTORE_ENDPOINT = os.getenv("REDUCTSTORE_ENDPOINT")
-REDUCTSTORE_ACCESS_KEY = os.getenv("REDUCTSTORE_ACCESS_KEY")
-REDUCTSTORE_BUCKET = os.getenv("REDUCTSTORE_BUCKET")
-REDUCTSTORE_ENTRY = os.getenv("REDUCTSTORE_ENTRY")
-
-# TimescaleDB
-
-TIMESCALE_ENDPOINT = os.getenv("TIMESCALE_ENDPOINT")
-TIMESCALE_USER = os.getenv("TIMESCALE_USER")
-TIMESCALE_PASSWORD = os.getenv("TIMESCALE_PASSWORD")
-TIMESCALE_DATABASE = os.getenv("TIMESCALE_DATABASE")
-
-# MongoDB
-MONGODB_DATABASE = os.getenv("MONGODB_DATABASE")
-MONGODB_USER = os.getenv("MONGODB_USER")
-MONGODB_ENDPOINT = os.getenv("MONGODB_ENDPOINT")
-MONGODB_PASSWORD = os.getenv("MONGODB_PASSWORD")
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Settings of the benchmarked systems, read once from the environment."""
+
+    # Minio
+    minio_endpoint: str | None = None
+    minio_access_key: str | None = None
+    minio_secret_key: str | None = None
+    minio_is_secure: bool = False
+    minio_bucket: str | None = None
+
+    # InfluxDB
+    influxdb_endpoint: str | None = None
+    influxdb_token: str | None = None
+    influxdb_org: str | None = None
+    influxdb_bucket: str | None = None
+    influxdb_measurement: str | None = None
+    influxdb_field: str | None = None
+
+    # ReductStore
+    reductstore_endpoint: str | None = None
+    reductstore_access_key: str | None = None
+    reductstore_bucket: str | None = None
+    reductstore_entry: str | None = None
+
+    # TimescaleDB
+    timescale_endpoint: str | None = None
+    timescale_user: str | None = None
+    timescale_password: str | None = None
+    timescale_database: str | None = None
+
+    # MongoDB
+    mongodb_database: str | None = None
+    mongodb_user: str | None = None
+    mongodb_endpoint: str | None = None
+    mongodb_password: str | None = None
+
+
+_env = dict(os.environ)
+
+CONFIG = Config(
+    minio_endpoint=_env.get("MINIO_ENDPOINT"),
+    minio_access_key=_env.get("MINIO_ACCESS_KEY"),
+    minio_secret_key=_env.get("MINIO_SECRET_KEY"),
+    minio_is_secure=str_to_bool(_env.get("MINIO_IS_SECURE", "false")),
+    minio_bucket=_env.get("MINIO_BUCKET"),
+    influxdb_endpoint=_env.get("INFLUXDB_ENDPOINT"),
+    influxdb_token=_env.get("INFLUXDB_TOKEN"),
+    influxdb_org=_env.get("INFLUXDB_ORG"),
+    influxdb_bucket=_env.get("INFLUXDB_BUCKET"),
+    influxdb_measurement=_env.get("INFLUXDB_MEASUREMENT"),
+    influxdb_field=_env.get("INFLUXDB_FIELD"),
+    reductstore_endpoint=_env.get("REDUCTSTORE_ENDPOINT"),
+    reductstore_access_key=_env.get("REDUCTSTORE_ACCESS_KEY"),
+    reductstore_bucket=_env.get("REDUCTSTORE_BUCKET"),
+    reductstore_entry=_env.get("REDUCTSTORE_ENTRY"),
+    timescale_endpoint=_env.get("TIMESCALE_ENDPOINT"),
+    timescale_user=_env.get("TIMESCALE_USER"),
+    timescale_password=_env.get("TIMESCALE_PASSWORD"),
+    timescale_database=_env.get("TIMESCALE_DATABASE"),
+    mongodb_database=_env.get("MONGODB_DATABASE"),
+    mongodb_user=_env.get("MONGODB_USER"),
+    mongodb_endpoint=_env.get("MONGODB_ENDPOINT"),
+    mongodb_password=_env.get("MONGODB_PASSWORD"),
+)
+
+
+def __getattr__(name: str):
+    """Keep the module-level constants (e.g. `MINIO_BUCKET`) importable."""
+    if name.isupper() and name.lower() in Config.__dataclass_fields__:
+        return getattr(CONFIG, name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 
 
 class BaseSystem(ABC):
+    __slots__ = ()
+
     @classmethod
     @abstractmethod
     async def create(cls):
@@ -1,9 +1,11 @@
+import asyncio
 import io
 
 import aiohttp
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+from influxdb_client import InfluxDBClient, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 from miniopy_async import Minio
+from miniopy_async.deleteobjects import DeleteObject
 
 from config import (
     INFLUXDB_BUCKET,
@@ -21,21 +23,54 @@ from config import (
 from systems.base_system import BaseSystem
 from utils import to_rfc3339
 
+# Maximum number of concurrent requests sent to MinIO
+MAX_CONCURRENT_REQUESTS = 32
+
+# Line protocol escaping of measurements and field keys, as done by `Point`
+_ESCAPE_WHITESPACE = {" ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"}
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", **_ESCAPE_WHITESPACE})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", **_ESCAPE_WHITESPACE})
+
+# Measurement and field key of the written lines, escaped once
+_LINE_PREFIX = (
+    f"{(INFLUXDB_MEASUREMENT or '').translate(_ESCAPE_MEASUREMENT)} "
+    f"{(INFLUXDB_FIELD or '').translate(_ESCAPE_KEY)}="
+)
+
 
 class InfluxDBMinioSystem(BaseSystem):
+    __slots__ = (
+        "minio_client",
+        "influx_client",
+        "_write_api",
+        "_query_api",
+        "_buckets_api",
+        "_session",
+    )
+
     @classmethod
     async def create(cls):
         """Create Minio and InfluxDB buckets."""
         self = cls()
+        # Keep idle connections (and the resolved endpoint) long enough to be
+        # reused across the benchmark phases instead of reconnecting
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=64,
+                limit_per_host=64,
+                keepalive_timeout=60,
+                ttl_dns_cache=None,
+            )
+        )
 
         found = await self.minio_client.bucket_exists(MINIO_BUCKET)
         if not found:
             print("Creating Minio bucket...")
             await self.minio_client.make_bucket(MINIO_BUCKET)
 
-        found = self.influx_client.buckets_api().find_bucket_by_name(INFLUXDB_BUCKET)
+        found = self._buckets_api.find_bucket_by_name(INFLUXDB_BUCKET)
         if not found:
-            self.influx_client.buckets_api().create_bucket(
+            self._buckets_api.create_bucket(
                 org=INFLUXDB_ORG, bucket_name=INFLUXDB_BUCKET
             )
 
@@ -53,84 +88,114 @@ class InfluxDBMinioSystem(BaseSystem):
             url=INFLUXDB_ENDPOINT,
             token=INFLUXDB_TOKEN,
             org=INFLUXDB_ORG,
+            enable_gzip=True,
         )
+        self._write_api = self.influx_client.write_api(write_options=SYNCHRONOUS)
+        self._query_api = self.influx_client.query_api()
+        self._buckets_api = self.influx_client.buckets_api()
+        self._session: aiohttp.ClientSession | None = None
 
     async def cleanup(self) -> None:
         """Delete Minio and InfluxDB buckets."""
-        # Continuously list and delete objects in Minio bucket until no more objects are found
-        while True:
-            objects = await self.minio_client.list_objects(MINIO_BUCKET)
-            object_list = list(objects)
-            if not object_list:
-                break
-            for obj in object_list:
-                try:
-                    await self.minio_client.remove_object(MINIO_BUCKET, obj.object_name)
-                except Exception as e:
-                    print(f"Error removing object {obj.object_name}: {e}")
-                    continue
-
-        # Now that all objects are presumably deleted, delete the Minio bucket
-        try:
-            await self.minio_client.remove_bucket(MINIO_BUCKET)
-        except Exception as e:
-            print(f"Error removing bucket {MINIO_BUCKET}: {e}")
-
-        # Find InfluxDB bucket ID
-        bucket = self.influx_client.buckets_api().find_bucket_by_name(INFLUXDB_BUCKET)
-
-        # Delete InfluxDB bucket
         try:
-            self.influx_client.buckets_api().delete_bucket(bucket=bucket)
-        except Exception as e:
-            print(f"Error removing InfluxDB bucket {INFLUXDB_BUCKET}: {e}")
-
-        # Verify InfluxDB bucket deletion
-        if not self.influx_client.buckets_api().find_bucket_by_name(INFLUXDB_BUCKET):
-            print(f"InfluxDB bucket {INFLUXDB_BUCKET} deleted successfully!")
-        else:
-            print(f"Failed to delete InfluxDB bucket {INFLUXDB_BUCKET}.")
+            # Continuously list and delete objects in Minio bucket until no more
+            # objects are found
+            while True:
+                objects = await self.minio_client.list_objects(MINIO_BUCKET)
+                object_list = list(objects)
+                if not object_list:
+                    break
+                # Delete the listed objects with Multi-Object Delete requests
+                errors = await self.minio_client.remove_objects(
+                    MINIO_BUCKET,
+                    [DeleteObject(obj.object_name) for obj in object_list],
+                )
+                for error in errors:
+                    print(f"Error removing object {error.name}: {error.message}")
+
+            # Now that all objects are presumably deleted, delete the Minio bucket
+            try:
+                await self.minio_client.remove_bucket(MINIO_BUCKET)
+            except Exception as e:
+                print(f"Error removing bucket {MINIO_BUCKET}: {e}")
+
+            # Find InfluxDB bucket ID
+            bucket = self._buckets_api.find_bucket_by_name(INFLUXDB_BUCKET)
+
+            # Delete InfluxDB bucket
+            try:
+                self._buckets_api.delete_bucket(bucket=bucket)
+            except Exception as e:
+                print(f"Error removing InfluxDB bucket {INFLUXDB_BUCKET}: {e}")
+
+            # Verify InfluxDB bucket deletion
+            if not self._buckets_api.find_bucket_by_name(INFLUXDB_BUCKET):
+                print(f"InfluxDB bucket {INFLUXDB_BUCKET} deleted successfully!")
+            else:
+                print(f"Failed to delete InfluxDB bucket {INFLUXDB_BUCKET}.")
+        finally:
+            # Release the clients even if deleting the buckets failed
+            try:
+                self._write_api.close()
+            finally:
+                await self._session.close()
 
     async def write_data(self, data: bytes, timestamp_ns: int) -> None:
         """Write data to Minio and InfluxDB."""
-        # Write data to Minio
-        result = await self.minio_client.put_object(
-            MINIO_BUCKET,
-            str(timestamp_ns),
-            io.BytesIO(data),
-            length=len(data),
+        # The object name is derived from the timestamp, so it is known
+        # before the upload and the InfluxDB record does not depend on it.
+        # Zero-padding keeps the lexicographic order of the keys chronological
+        object_name = f"{timestamp_ns:020d}"
+
+        # Write data to Minio and the object name to InfluxDB concurrently;
+        # the blocking InfluxDB write runs in the default executor.
+        # put_object needs a readable stream; BytesIO shares the buffer of
+        # `data` and returns it without a copy when read in one piece
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            self.minio_client.put_object(
+                MINIO_BUCKET,
+                object_name,
+                io.BytesIO(data),
+                length=len(data),
+            ),
+            loop.run_in_executor(None, self._write_point, object_name, timestamp_ns),
         )
 
-        # Write object name to InfluxDB
-        point = Point(INFLUXDB_MEASUREMENT).field(INFLUXDB_FIELD, result.object_name)
-        self.influx_client.write_api(write_options=SYNCHRONOUS).write(
+    def _write_point(self, object_name: str, timestamp_ns: int) -> None:
+        """Write the object name to InfluxDB."""
+        # The object name is all digits, so the string field needs no escaping
+        line = f'{_LINE_PREFIX}"{object_name}" {timestamp_ns}'
+        self._write_api.write(
             bucket=INFLUXDB_BUCKET,
-            record=point,
-            time=timestamp_ns,
+            record=line,
             write_precision=WritePrecision.NS,
         )
 
     async def read_last(self) -> bytes:
         """Retrieve the last object from MinIO based on filenames recorded in InfluxDB."""
-        # Read object name from InfluxDB
+        # Read object name from InfluxDB. The range is unbounded so that older
+        # records are found too; range |> filter |> last() is pushed down to
+        # the storage engine, which reads only the last point
         query = f'from(bucket: "{INFLUXDB_BUCKET}") \
-            |> range(start: -10s) \
+            |> range(start: 0) \
             |> filter(fn: (r) => r._measurement == "{INFLUXDB_MEASUREMENT}") \
-            |> last()'
+            |> filter(fn: (r) => r._field == "{INFLUXDB_FIELD}") \
+            |> last() \
+            |> keep(columns: ["_value"])'
 
-        result = self.influx_client.query_api().query(query)
+        result = self._query_api.query(query)
         if not result or not result[0].records:
             raise ValueError("No records found in InfluxDB.")
         object_name = result[0].records[0]["_value"]
 
         # Get object from Minio
-        async with aiohttp.ClientSession() as session:
-            response = await self.minio_client.get_object(
-                MINIO_BUCKET,
-                object_name,
-                session=session,
-            )
-            return await response.read()
+        response = await self.minio_client.get_object(
+            MINIO_BUCKET,
+            object_name,
+            session=self._session,
+        )
+        return await response.read()
 
     async def read_batch(self, start_ns: int) -> list[bytes]:
         """Retrieve objects from MinIO based on filenames recorded in InfluxDB."""
@@ -138,19 +203,24 @@ class InfluxDBMinioSystem(BaseSystem):
         query = f'from(bucket: "{INFLUXDB_BUCKET}") \
             |> range(start: {to_rfc3339(start_ns)}) \
             |> filter(fn: (r) => r._measurement == "{INFLUXDB_MEASUREMENT}")'
-        result = self.influx_client.query_api().query(query)
+        result = self._query_api.query(query)
 
         object_names = [record["_value"] for record in result[0].records]
 
         # Get objects from Minio
-        objects = []
-        async with aiohttp.ClientSession() as session:
-            for object_name in object_names:
-                response = await self.minio_client.get_object(
-                    MINIO_BUCKET,
-                    object_name,
-                    session=session,
-                )
-                objects.append(await response.read())
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        return await asyncio.gather(
+            *[self._get_object(semaphore, object_name) for object_name in object_names]
+        )
 
-        return objects
+    async def _get_object(
+        self, semaphore: asyncio.Semaphore, object_name: str
+    ) -> bytes:
+        """Get an object from Minio once a request slot is free."""
+        async with semaphore:
+            response = await self.minio_client.get_object(
+                MINIO_BUCKET,
+                object_name,
+                session=self._session,
+            )
+            return await response.read()
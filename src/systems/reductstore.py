@@ -1,48 +1,55 @@
+from contextlib import AsyncExitStack
+
 from config import (
     REDUCTSTORE_ACCESS_KEY,
     REDUCTSTORE_BUCKET,
     REDUCTSTORE_ENDPOINT,
     REDUCTSTORE_ENTRY,
 )
-from reduct import BucketSettings, Client
+from reduct import Bucket, BucketSettings, Client
 from systems.base_system import BaseSystem
 
 
 class ReductStoreSystem(BaseSystem):
+    __slots__ = ("client", "bucket", "_exit_stack")
+
     @classmethod
     async def create(cls):
-        """Create ReductStore bucket."""
+        """Create ReductStore bucket and keep the client open until cleanup."""
         self = cls()
+        self._exit_stack = AsyncExitStack()
+        self.client: Client = await self._exit_stack.enter_async_context(
+            Client(REDUCTSTORE_ENDPOINT, REDUCTSTORE_ACCESS_KEY)
+        )
         settings = BucketSettings()
-        async with Client(REDUCTSTORE_ENDPOINT, REDUCTSTORE_ACCESS_KEY) as client:
-            await client.create_bucket(REDUCTSTORE_BUCKET, settings, True)
+        self.bucket: Bucket = await self.client.create_bucket(
+            REDUCTSTORE_BUCKET, settings, True
+        )
         return self
 
     async def cleanup(self) -> None:
-        """Delete ReductStore bucket."""
-        async with Client(REDUCTSTORE_ENDPOINT, REDUCTSTORE_ACCESS_KEY) as client:
-            bucket = await client.get_bucket(REDUCTSTORE_BUCKET)
-            await bucket.remove()
+        """Delete ReductStore bucket and close the client."""
+        try:
+            await self.bucket.remove()
+        finally:
+            await self._exit_stack.aclose()
 
     async def write_data(self, data: bytes, timestamp_ns: int) -> None:
         """Write data to ReductStore."""
-        async with Client(REDUCTSTORE_ENDPOINT, REDUCTSTORE_ACCESS_KEY) as client:
-            bucket = await client.get_bucket(REDUCTSTORE_BUCKET)
-            await bucket.write(REDUCTSTORE_ENTRY, data, timestamp_ns // 1_000)
+        await self.bucket.write(REDUCTSTORE_ENTRY, data, timestamp_ns // 1_000)
 
     async def read_last(self) -> bytes:
         """Read last data from ReductStore."""
-        async with Client(REDUCTSTORE_ENDPOINT, REDUCTSTORE_ACCESS_KEY) as client:
-            bucket = await client.get_bucket(REDUCTSTORE_BUCKET)
-            async with bucket.read(REDUCTSTORE_ENTRY) as record:
-                return await record.read_all()
+        async with self.bucket.read(REDUCTSTORE_ENTRY) as record:
+            return await record.read_all()
 
     async def read_batch(self, start_ns: int) -> list[bytes]:
-        """Read batch of data from ReductStore."""
-        result = []
-        async with Client(REDUCTSTORE_ENDPOINT, REDUCTSTORE_ACCESS_KEY) as client:
-            bucket = await client.get_bucket(REDUCTSTORE_BUCKET)
-            async for record in bucket.query(REDUCTSTORE_ENTRY, start_ns // 1_000):
-                data: bytes = await record.read_all()
-                result.append(data)
-            return result
+        """Read batch of data from ReductStore.
+
+        The SDK streams the records of a query in batches over one response,
+        so the payloads have to be read in order rather than concurrently.
+        """
+        return [
+            await record.read_all()
+            async for record in self.bucket.query(REDUCTSTORE_ENTRY, start_ns // 1_000)
+        ]
@@ -1,60 +1,59 @@
-from datetime import datetime
 from typing import List
 
-import psycopg2
+import asyncpg
 from config import TIMESCALE_DATABASE, TIMESCALE_USER, TIMESCALE_PASSWORD, TIMESCALE_ENDPOINT
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from systems.base_system import BaseSystem
+from utils import ns_to_datetime
 
 
 TIMESCALE_CONNECTION=f"postgresql://{TIMESCALE_USER}:{TIMESCALE_PASSWORD}@{TIMESCALE_ENDPOINT}"
 
 class TimescaleDBSystem(BaseSystem):
+    __slots__ = ("pool",)
+
     @classmethod
     async def create(cls):
-        return cls()
-
-    def __init__(self):
-        self.con = psycopg2.connect(TIMESCALE_CONNECTION)
-        self.con.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cur = self.con.cursor()
-        cur.execute(f"DROP DATABASE IF EXISTS {TIMESCALE_DATABASE}")
-        cur.execute(f"CREATE DATABASE {TIMESCALE_DATABASE}")
-        cur.execute("CREATE EXTENSION IF NOT EXISTS timescaledb CASCADE;")
-        cur.execute(
-            """CREATE TABLE IF NOT EXISTS data (
-                time TIMESTAMPTZ NOT NULL,
-                data BYTEA NOT NULL
-                );
-            """
+        self = cls()
+        self.pool = await asyncpg.create_pool(
+            TIMESCALE_CONNECTION, min_size=4, max_size=32
         )
-        self.con.commit()
+        async with self.pool.acquire() as con:
+            await con.execute(f"DROP DATABASE IF EXISTS {TIMESCALE_DATABASE}")
+            await con.execute(f"CREATE DATABASE {TIMESCALE_DATABASE}")
+            await con.execute("CREATE EXTENSION IF NOT EXISTS timescaledb CASCADE;")
+            await con.execute(
+                """CREATE TABLE IF NOT EXISTS data (
+                    time TIMESTAMPTZ NOT NULL,
+                    data BYTEA NOT NULL
+                    );
+                """
+            )
+        return self
 
     async def cleanup(self) -> None:
-        with self.con.cursor() as cur:
-            cur.execute("DROP TABLE IF EXISTS data;")
-            cur.execute(f"DROP database IF EXISTS {TIMESCALE_DATABASE};")
+        async with self.pool.acquire() as con:
+            await con.execute("DROP TABLE IF EXISTS data;")
+            await con.execute(f"DROP database IF EXISTS {TIMESCALE_DATABASE};")
+        await self.pool.close()
 
     async def write_data(self, data: bytes, timestamp_ns: int) -> None:
-        with self.con.cursor() as cur:
-            cur.execute(
-                "INSERT INTO data (time, data) VALUES (%s, %s);",
-                (
-                    datetime.fromtimestamp(timestamp_ns / 1e9),
-                    psycopg2.Binary(data),
-                ),
+        async with self.pool.acquire() as con:
+            await con.execute(
+                "INSERT INTO data (time, data) VALUES ($1, $2);",
+                ns_to_datetime(timestamp_ns),
+                data,
             )
 
     async def read_last(self) -> bytes:
-        with self.con.cursor() as cur:
-            cur.execute("SELECT data FROM data ORDER BY time DESC LIMIT 1;")
-            obj = cur.fetchone()[0]
-            return bytes(obj)
+        async with self.pool.acquire() as con:
+            return await con.fetchval(
+                "SELECT data FROM data ORDER BY time DESC LIMIT 1;"
+            )
 
     async def read_batch(self, start_ns: int) -> List[bytes]:
-        with self.con.cursor() as cur:
-            cur.execute(
-                "SELECT data FROM data WHERE time >= %s;",
-                (datetime.fromtimestamp(start_ns / 1e9),),
+        async with self.pool.acquire() as con:
+            rows = await con.fetch(
+                "SELECT data FROM data WHERE time >= $1;",
+                ns_to_datetime(start_ns),
             )
-            return [bytes(row[0]) for row in cur.fetchall()]
+            return [row["data"] for row in rows]
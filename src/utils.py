@@ -1,26 +1,110 @@
 import os
 import sys
+import time
 import datetime
-from itertools import zip_longest
+import functools
+import queue
+import threading
+from typing import Iterator
 
+import numpy as np
+from numpy.typing import ArrayLike
 from tqdm import tqdm
 
 
+# Blob contents need no cryptographic strength, so they come from numpy's
+# PCG64 generator instead of the kernel CSPRNG behind os.urandom. This also
+# beats os.getrandom(..., GRND_INSECURE), which still costs a syscall per call
+_rng = np.random.default_rng()
+
+# Random bytes for requests below _POOL_SIZE are sliced from a pool that is
+# refilled with a single generator call once it is used up
+_POOL_SIZE = 1 << 20
+_pool = memoryview(bytearray(_rng.bytes(_POOL_SIZE)))
+_pool_offset = 0
+_pool_lock = threading.Lock()
+
+
+def _random_bytes(size: int) -> bytes:
+    """Return `size` random bytes, served from the pool when possible."""
+    global _pool_offset
+    if size >= _POOL_SIZE:
+        return _rng.bytes(size)
+    with _pool_lock:
+        if _pool_offset + size > _POOL_SIZE:
+            _pool[:] = _rng.bytes(_POOL_SIZE)
+            _pool_offset = 0
+        start = _pool_offset
+        _pool_offset += size
+        return bytes(_pool[start:_pool_offset])
+
+
 def generate_blob(size: int) -> bytes:
-    """Generate a random blob of the given size."""
-    return os.urandom(size)
+    """Generate a random blob of the given size.
+
+    Every blob is drawn independently, so blobs neither compress nor dedupe
+    against each other.
+    """
+    return _random_bytes(size)
+
+
+def produce_blobs(
+    size: int, count: int, stop: threading.Event, maxsize: int = 4
+) -> Iterator[bytes]:
+    """Generate `count` blobs of the given size in a background thread.
+
+    The blobs are handed over through a queue holding up to `maxsize` of them,
+    so generating the next blobs overlaps with whatever the caller does
+    in the meantime. An error in the thread is raised by the iterator.
+    Setting `stop` makes the thread exit, e.g. when the caller gives up
+    before taking all blobs, instead of blocking on a full queue forever.
+    """
+    blobs: queue.Queue = queue.Queue(maxsize)
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                blobs.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for _ in range(count):
+                if not put(generate_blob(size)):
+                    return
+        except Exception as err:
+            put(err)
+
+    def consume():
+        for _ in range(count):
+            blob = blobs.get()
+            if isinstance(blob, Exception):
+                raise blob
+            yield blob
+
+    # Start the thread right away rather than on the first `next()`
+    threading.Thread(target=produce, daemon=True).start()
+    return consume()
+
+
+# Binary units indexed by (bit length - 1) // 10, capped at GiB
+_SIZE_UNITS = ((0, "B"), (10, "KiB"), (20, "MiB"), (30, "GiB"))
 
 
 def format_size_binary(size: int) -> str:
     """Format the given size in bytes to a human-readable string."""
-    if size >= 2**30:
-        return f"{size // 2**30} GiB"
-    elif size >= 2**20:
-        return f"{size // 2**20} MiB"
-    elif size >= 2**10:
-        return f"{size // 2**10} KiB"
-    else:
-        return f"{size} B"
+    shift, unit = _SIZE_UNITS[min(max(size.bit_length() - 1, 0) // 10, 3)]
+    return f"{size >> shift} {unit}"
+
+
+@functools.lru_cache(maxsize=1)
+def _disk_free(path: str = ".") -> int:
+    """Return the disk space (in bytes) available to unprivileged users."""
+    statvfs = os.statvfs(path)
+    return statvfs.f_frsize * statvfs.f_bavail
 
 
 def print_benchmark_params(
@@ -29,9 +113,9 @@ def print_benchmark_params(
     batch_reads: int,
     warmups: int,
 ):
-    required_disk_space = max(blob_sizes) * (batch_size + warmups)
-    statvfs = os.statvfs(".")
-    disk_space_available = statvfs.f_frsize * statvfs.f_bavail
+    max_blob_size = max(blob_sizes)
+    required_disk_space = max_blob_size * (batch_size + warmups)
+    disk_space_available = _disk_free()
 
     blob_sizes_formatted = [format_size_binary(size) for size in blob_sizes]
 
@@ -58,41 +142,125 @@ def print_benchmark_params(
     print("=" * 50)
 
 
-def ask_for_confirmation():
+def ask_for_confirmation(auto: bool = False):
+    if auto:
+        return
     print("\nWould you like to continue? (y/n)")
     if input().lower() != "y":
         sys.exit(0)
 
 
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def ns_to_datetime(ns_timestamp: int) -> datetime.datetime:
+    """Convert the given Unix timestamp (in nanoseconds) to an aware UTC datetime.
+
+    Integer arithmetic keeps the full microsecond precision, which a float
+    division by 1e9 loses for current timestamps.
+    """
+    return _EPOCH + datetime.timedelta(microseconds=ns_timestamp // 1_000)
+
+
 def to_rfc3339(ns_timestamp: int) -> str:
     """Convert the given Unix timestamp (in nanoseconds) to the RFC3339 format."""
-    dt = datetime.datetime.utcfromtimestamp(ns_timestamp / 1e9)
-    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f") + "Z"
+    seconds, nanoseconds = divmod(ns_timestamp, 1_000_000_000)
+    tm = time.gmtime(seconds)
+    return (
+        f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d}"
+        f"T{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}.{nanoseconds:09d}Z"
+    )
 
 
-def save_results(
-    filename: str,
-    directory: str,
-    blob_size: int,
-    batch_size: int,
-    write_times: list[float] = [],
-    read_times: list[float] = [],
-    quiet: bool = False,
-):
-    """Append the given results to the given CSV file."""
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-    path = os.path.join(directory, filename)
-    write_header = not os.path.exists(path)
-
-    with open(path, "a") as f:
-        if write_header:
-            f.write("write_time,read_time,blob_size,batch_size\n")
-        for write_time, read_time in zip_longest(write_times, read_times):
-            f.write(
-                f"{write_time or 'N/A'},{read_time or 'N/A'},{blob_size},{batch_size}\n"
+def _format_times(times: np.ndarray) -> np.ndarray:
+    """Format the given times as strings, writing missing (NaN) ones as N/A.
+
+    Only NaN counts as missing, so a measured time of 0.0 is kept.
+    """
+    return np.where(np.isnan(times), "N/A", times.astype(str))
+
+
+class ResultsWriter:
+    """Append benchmark results to CSV files in a directory.
+
+    Each file is opened on its first append and stays open until `close()`,
+    so repeated appends do not reopen it. The rows of an append are joined
+    and encoded in memory, then passed to `os.write` on the raw descriptor,
+    which skips the buffering and encoding layers of a text file.
+    """
+
+    HEADER = "write_time,read_time,blob_size,batch_size\n"
+
+    def __init__(self, directory: str, quiet: bool = False):
+        self.directory = directory
+        self.quiet = quiet
+        self._files: dict[str, int] = {}
+
+    def __enter__(self) -> "ResultsWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, filename: str, results: ArrayLike) -> None:
+        """Append the given results to the given CSV file.
+
+        `results` holds one row per measurement with the columns
+        (write_time, read_time, blob_size, batch_size), times in seconds.
+        Missing times are NaN. Any array-like is accepted; it is converted
+        without copying when it already is a float array. A single row may
+        be given as a 1-D array of length 4.
+        """
+        results = np.asarray(results, dtype=float)
+        if results.shape in ((0,), (4,)):
+            results = results.reshape(-1, 4)
+        if results.ndim != 2 or results.shape[1] != 4:
+            raise ValueError(
+                f"Expected rows of 4 columns, got an array of shape {results.shape}"
             )
+        if not len(results):
+            return
+
+        fd = self._files.get(filename)
+        if fd is None:
+            fd = self._files[filename] = self._open(filename)
+
+        # Convert and join the columns with numpy instead of formatting each
+        # row in Python, then write the whole payload at once
+        columns = [
+            _format_times(results[:, 0]),
+            _format_times(results[:, 1]),
+            results[:, 2].astype(np.int64).astype(str),
+            results[:, 3].astype(np.int64).astype(str),
+        ]
+        lines = columns[0]
+        for column in columns[1:]:
+            lines = np.char.add(np.char.add(lines, ","), column)
+        _write_all(fd, ("\n".join(lines.tolist()) + "\n").encode("ascii"))
+
+        if not self.quiet:
+            tqdm.write(f"Results saved to {os.path.join(self.directory, filename)}")
+
+    def close(self) -> None:
+        """Close all open files."""
+        for fd in self._files.values():
+            os.close(fd)
+        self._files.clear()
+
+    def _open(self, filename: str) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = os.path.join(self.directory, filename)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        # A new or empty file ends at offset 0 and still needs the header
+        if os.lseek(fd, 0, os.SEEK_END) == 0:
+            _write_all(fd, self.HEADER.encode("ascii"))
+        return fd
+
 
-    if not quiet:
-        tqdm.write(f"Results saved to {path}")
+def _write_all(fd: int, data: bytes) -> None:
+    """Write all of the given data to the given file descriptor."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]